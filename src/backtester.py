@@ -1,9 +1,116 @@
+import functools
+import hashlib
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
 import yfinance as yf
-from sklearn.linear_model import LinearRegression
 import matplotlib.pyplot as plt
 
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:  # Optional: run_event_study falls back to the NumPy batch path
+    HAS_NUMBA = False
+
+
+def _fit_market_model(X, y):
+    """
+    Closed-form univariate OLS of y on X along the last axis: beta = cov(X, y) / var(X).
+    Works on a single (E,) window or a stack of (N, E) windows; alpha/beta drop the last axis.
+    Means are taken in float64, so float32 inputs are upcast for the reductions.
+    """
+    x_mean = X.mean(axis=-1, keepdims=True, dtype=np.float64)
+    y_mean = y.mean(axis=-1, keepdims=True, dtype=np.float64)
+    x_dev = X - x_mean
+    beta = (x_dev * (y - y_mean)).sum(axis=-1) / (x_dev ** 2).sum(axis=-1)
+    alpha = y_mean[..., 0] - beta * x_mean[..., 0]
+    return alpha, beta
+
+
+def _run_events_numpy(arr, bench_col, stock_cols, event_idxs, est_len, win_start_off, win_end_off):
+    """
+    Batch event study: indexes every event's windows out of strided (T, C, window) views
+    of arr and scores them with broadcasted arithmetic. Returns (car, real_return) arrays.
+    """
+    if len(event_idxs) == 0:  # Views below need at least one full window of history
+        return np.empty(0), np.empty(0)
+    
+    # Rolling views: est_windows[t, c] is arr[t:t + est_len, c] (no copy until indexed)
+    win_len = win_end_off - win_start_off + 1
+    est_windows = np.lib.stride_tricks.sliding_window_view(arr, est_len, axis=0)
+    trade_windows = np.lib.stride_tricks.sliding_window_view(arr, win_len, axis=0)
+    
+    # Estimation Window stops before the Trade Window starts (see calculate_expected_return)
+    est_starts = event_idxs - est_len - abs(win_start_off)
+    win_starts = event_idxs + win_start_off
+    
+    # 1. Calculate Market Beta for every event: (N, E) stock (y) and benchmark (X) returns
+    y = est_windows[est_starts, stock_cols]
+    X = est_windows[est_starts, bench_col]
+    alpha, beta = _fit_market_model(X, y)
+    
+    # 2. Calculate Abnormal Returns during the 'Trade Window'
+    real_returns = trade_windows[win_starts, stock_cols]
+    market_returns = trade_windows[win_starts, bench_col]
+    
+    # Abnormal Return = Real - Expected, where Expected = Alpha + Beta * Market_Return
+    abnormal_returns = real_returns - alpha[:, None] - beta[:, None] * market_returns
+    
+    # Cumulative Abnormal Return (CAR) - This is your 'Edge'
+    return abnormal_returns.sum(axis=1), real_returns.sum(axis=1, dtype=np.float64)
+
+
+@functools.lru_cache(maxsize=None)
+def _make_event_kernel(est_len):
+    """
+    Builds the Numba event-study kernel with est_len baked in as a compile-time constant, so the
+    fixed-length estimation-window reductions can be fully unrolled/vectorized by LLVM.
+    Memoized per est_len; the kernel takes the same arguments as _run_events_numpy minus est_len.
+    """
+    @njit(parallel=True, cache=False)
+    def _run_events_numba(arr, bench_col, stock_cols, event_idxs, win_start_off, win_end_off):
+        # One prange iteration per event, O(E) reductions with no temporaries.
+        # Accumulators are float64 regardless of the dtype of arr.
+        N = len(event_idxs)
+        car = np.empty(N)
+        real = np.empty(N)
+        
+        for n in prange(N):
+            s = stock_cols[n]
+            est_start = event_idxs[n] - est_len - abs(win_start_off)
+            
+            # Means first, then centered sums (two passes keeps beta stable on tiny returns)
+            sx = 0.0
+            sy = 0.0
+            for k in range(est_len):
+                sx += arr[est_start + k, bench_col]
+                sy += arr[est_start + k, s]
+            x_mean = sx / est_len
+            y_mean = sy / est_len
+            
+            sxy = 0.0
+            sxx = 0.0
+            for k in range(est_len):
+                dx = arr[est_start + k, bench_col] - x_mean
+                sxy += dx * (arr[est_start + k, s] - y_mean)
+                sxx += dx * dx
+            beta = sxy / sxx
+            alpha = y_mean - beta * x_mean
+            
+            # CAR and raw return over the Trade Window
+            c = 0.0
+            r = 0.0
+            for k in range(event_idxs[n] + win_start_off, event_idxs[n] + win_end_off + 1):
+                r += arr[k, s]
+                c += arr[k, s] - alpha - beta * arr[k, bench_col]
+            car[n] = c
+            real[n] = r
+        
+        return car, real
+    
+    return _run_events_numba
+
 class BiotechEventBacktester:
     """
     Custom Event-Study Framework for FDA Catalyst Trading.
@@ -22,25 +129,64 @@ class BiotechEventBacktester:
         self.estimation_window = estimation_window
         self.event_window = event_window
         self.market_data = None
-        self.results = []
+        self.results = None
 
-    def fetch_market_data(self, tickers, start_date, end_date):
+    def fetch_market_data(self, tickers, start_date, end_date, cache_dir='.cache'):
         """
         Fetches price data. 
         NOTE: In a production environment, this step requires a survivorship-bias-free database 
         (e.g., Norgate Data) to account for delisted biotechs. 
         For this prototype, we use yfinance with known limitations.
+        
+        Prices are cached as Parquet under cache_dir, keyed by (tickers, start, end), so reruns
+        skip the network entirely. Only closed historical ranges (end_date before today) are
+        cached; open-ended ranges are always re-downloaded so new trading days show up.
+        Pass cache_dir=None to always re-download.
         """
         print(f"Fetching data for {len(tickers)} tickers + {self.benchmark_ticker}...")
         all_tickers = tickers + [self.benchmark_ticker]
         
-        # Download adjusted close prices
-        data = yf.download(all_tickers, start=start_date, end=end_date, progress=False)['Adj Close']
+        # Cache entries never expire, so skip the cache unless the range has already closed
+        cache_path = None
+        range_closed = end_date is not None and pd.Timestamp(end_date).normalize() < pd.Timestamp.today().normalize()
+        if cache_dir is not None and range_closed:
+            key = hashlib.md5(repr((sorted(all_tickers), start_date, end_date)).encode()).hexdigest()
+            cache_path = Path(cache_dir) / f'{key}.parquet'
+        
+        if cache_path is not None and cache_path.exists():
+            data = pd.read_parquet(cache_path, engine='pyarrow')
+            print(f"Loaded cached prices from {cache_path}.")
+        else:
+            # Download adjusted close prices (one thread per ticker)
+            data = yf.download(all_tickers, start=start_date, end=end_date, progress=False, threads=True)['Adj Close']
+            
+            # yfinance reports a failed ticker as a missing / all-NaN column; never cache those
+            complete = set(all_tickers).issubset(data.columns) and not data.isna().all().any()
+            if cache_path is not None and complete:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                data.to_parquet(cache_path, engine='pyarrow')
+            elif cache_path is not None:
+                print("Download incomplete for some tickers; not caching this range.")
         
-        # Calculate daily log returns
-        self.market_data = np.log(data / data.shift(1)).dropna()
+        # Calculate daily log returns on the raw ndarray: one log pass, then a row difference.
+        # Rows with a missing price are dropped first so every return window is complete.
+        # Stored as float32 (~7 significant digits is plenty for daily returns) to halve memory traffic;
+        # the event-study reductions accumulate in float64.
+        data = data.dropna()
+        log_prices = np.log(data.to_numpy())
+        returns = np.diff(log_prices, axis=0).astype(np.float32)
+        self.market_data = pd.DataFrame(returns, index=data.index[1:], columns=data.columns)
         print("Data fetch complete.")
 
+    def _market_arrays(self):
+        """
+        Returns (arr, bench_col): market_data as a plain ndarray plus the benchmark's column, so the
+        event study slices raw NumPy memory instead of going through pandas indexing.
+        Taken from market_data on every call, so positions always line up with its index/columns.
+        """
+        arr = self.market_data.to_numpy(copy=False)
+        return arr, self.market_data.columns.get_loc(self.benchmark_ticker)
+
     def calculate_expected_return(self, stock_ticker, event_date_idx):
         """
         Uses the Market Model (CAPM-lite) to predict what the stock *should* have done 
@@ -55,70 +201,69 @@ class BiotechEventBacktester:
             return None # Not enough history
 
         # Slice data for regression
-        y = self.market_data[stock_ticker].iloc[est_start:est_end].values.reshape(-1, 1)
-        X = self.market_data[self.benchmark_ticker].iloc[est_start:est_end].values.reshape(-1, 1)
+        arr, bench_col = self._market_arrays()
+        y = arr[est_start:est_end, self.market_data.columns.get_loc(stock_ticker)]
+        X = arr[est_start:est_end, bench_col]
         
         # Calculate Beta (sensitivity to XBI) and Alpha (baseline drift)
-        model = LinearRegression().fit(X, y)
-        beta = model.coef_[0][0]
-        alpha = model.intercept_[0]
+        alpha, beta = _fit_market_model(X, y)
         
-        return alpha, beta
+        return float(alpha), float(beta)
 
     def run_event_study(self, events_df):
         """
-        Core Logic: Iterates through your 'Quality Analyzer' signals.
+        Core Logic: Scores all of your 'Quality Analyzer' signals in one batch.
         events_df must have columns: ['ticker', 'event_date', 'quality_score', 'catalyst_type']
         """
         print("Running Event Study Analysis...")
         
-        for idx, row in events_df.iterrows():
-            ticker = row['ticker']
-            date = pd.to_datetime(row['event_date'])
-            quality = row['quality_score']
-            
-            if ticker not in self.market_data.columns:
-                continue
-                
-            # Find the index location of the event date
-            try:
-                event_idx = self.market_data.index.get_loc(date)
-            except KeyError:
-                continue
-            
-            # 1. Calculate Market Beta
-            params = self.calculate_expected_return(ticker, event_idx)
-            if not params: continue
-            alpha, beta = params
-            
-            # 2. Calculate Abnormal Returns during the 'Trade Window'
-            win_start = event_idx + self.event_window[0]
-            win_end = event_idx + self.event_window[1]
-            
-            # Real Return of the stock
-            real_returns = self.market_data[ticker].iloc[win_start:win_end+1]
-            
-            # Return of the Benchmark (XBI)
-            market_returns = self.market_data[self.benchmark_ticker].iloc[win_start:win_end+1]
-            
-            # Expected Return = Alpha + Beta * Market_Return
-            expected_returns = alpha + (beta * market_returns)
-            
-            # Abnormal Return = Real - Expected
-            abnormal_returns = real_returns - expected_returns
-            
-            # Cumulative Abnormal Return (CAR) - This is your 'Edge'
-            car = abnormal_returns.sum()
-            
-            self.results.append({
-                'Ticker': ticker,
-                'Event_Date': date,
-                'Quality_Score': quality,
-                'CAR': car,
-                'Real_Return': real_returns.sum()
-            })
+        arr, bench_col = self._market_arrays()
+        
+        # Pull the event columns out as plain arrays once, rather than boxing rows
+        tickers = events_df['ticker'].to_numpy()
+        dates = pd.to_datetime(events_df['event_date']).to_numpy()
+        qualities = events_df['quality_score'].to_numpy()
+        
+        # Locate every event date and stock column at once (-1 = not in the data)
+        event_idxs = self.market_data.index.get_indexer(dates)
+        stock_cols = self.market_data.columns.get_indexer(tickers)
+        
+        E = self.estimation_window
+        est_starts = event_idxs - E - abs(self.event_window[0])
+        win_ends = event_idxs + self.event_window[1]
+        
+        # Drop unknown tickers/dates, events without enough history, and windows running past the data
+        valid = (event_idxs != -1) & (stock_cols != -1) & (est_starts >= 0) & (win_ends < len(arr))
+        
+        # Events sharing a (ticker, event date) have identical windows: score each pair once
+        pairs, inverse = np.unique(
+            np.stack([stock_cols[valid], event_idxs[valid]], axis=1), axis=0, return_inverse=True
+        )
+        pair_cols = np.ascontiguousarray(pairs[:, 0])
+        pair_idxs = np.ascontiguousarray(pairs[:, 1])
+        
+        # Numba kernel specialized to the current estimation_window when available
+        # (memoized, so each window size compiles once), otherwise the equivalent NumPy batch
+        if HAS_NUMBA:
+            car, real_returns = _make_event_kernel(E)(arr, bench_col, pair_cols, pair_idxs,
+                                                      self.event_window[0], self.event_window[1])
+        else:
+            car, real_returns = _run_events_numpy(arr, bench_col, pair_cols, pair_idxs,
+                                                  E, self.event_window[0], self.event_window[1])
+        
+        # Fan the per-pair results back out to every event
+        inverse = inverse.reshape(-1)
+        car, real_returns = car[inverse], real_returns[inverse]
+        
+        self.results = pd.DataFrame({
+            'Ticker': tickers[valid],
+            'Event_Date': dates[valid],
+            'Quality_Score': qualities[valid],
+            'CAR': car,
+            'Real_Return': real_returns
+        })
             
-        return pd.DataFrame(self.results)
+        return self.results
 
 # --- EXAMPLE USAGE ---
 if __name__ == "__main__":
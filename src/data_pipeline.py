@@ -1,8 +1,74 @@
+import asyncio
 import pandas as pd
-import requests
+import httpx
+import orjson
 from datetime import datetime, timedelta
 import time
-import re
+
+try:
+    from rapidfuzz import process, fuzz
+    HAS_RAPIDFUZZ = True
+except ImportError:  # Optional: map_sponsors_to_tickers then only does exact (normalized) matches
+    HAS_RAPIDFUZZ = False
+
+
+# Shared regexes for _normalize. Kept as pattern strings because Arrow-backed string columns
+# reject compiled re.Pattern objects in .str.replace.
+# Input is lowercased first, so no case-insensitive flag is needed.
+_PUNCT_PATTERN = r'[,.]'
+_SUFFIX_PATTERN = r'\s+(inc|incorporated|corp|corporation|ltd|llc|plc|company|co|therapeutics|pharmaceuticals)\b'
+
+
+def _normalize(s):
+    """
+    Vectorized sponsor-name cleanup so 'Moderna, Inc.' and 'Moderna Inc' compare equal:
+    lowercase, drop commas/periods and corporate suffixes ('Inc', 'Pharmaceuticals', ...).
+    """
+    return (
+        s.str.lower()
+        .str.replace(_PUNCT_PATTERN, '', regex=True)
+        .str.replace(_SUFFIX_PATTERN, '', regex=True)
+        .str.strip()
+    )
+
+
+# Column order of the trials frame (also gives an empty fetch its columns)
+_TRIAL_COLUMNS = ['nct_id', 'title', 'sponsor', 'completion_date', 'phase', 'status']
+
+
+def _parse_study(study):
+    """Flattens one ClinicalTrials.gov v2 study record into a trials_data row."""
+    protocol = study.get('protocolSection', {})
+
+    # Identification
+    nct_id = protocol.get('identificationModule', {}).get('nctId', 'N/A')
+    title = protocol.get('identificationModule', {}).get('officialTitle', 'N/A')
+
+    # Sponsor (this is what we'll map to ticker)
+    sponsor_module = protocol.get('sponsorCollaboratorsModule', {})
+    lead_sponsor = sponsor_module.get('leadSponsor', {}).get('name', 'N/A')
+
+    # Dates - THIS IS YOUR EVENT DATE
+    status_module = protocol.get('statusModule', {})
+    completion_date = status_module.get('primaryCompletionDateStruct', {}).get('date', None)
+
+    # If no primary completion, try study completion
+    if not completion_date:
+        completion_date = status_module.get('completionDateStruct', {}).get('date', None)
+
+    # Phase verification
+    design_module = protocol.get('designModule', {})
+    phases = design_module.get('phases', [])
+
+    # Store
+    return {
+        'nct_id': nct_id,
+        'title': title,
+        'sponsor': lead_sponsor,
+        'completion_date': completion_date,
+        'phase': ', '.join(phases) if phases else 'N/A',
+        'status': status_module.get('overallStatus', 'N/A')
+    }
 
 class BiotechTrialPipeline:
     """
@@ -20,10 +86,20 @@ class BiotechTrialPipeline:
     def fetch_trials_by_condition(self, condition="cancer", phase="PHASE3", max_results=100):
         """
         Pulls trials from ClinicalTrials.gov API.
+        Blocking wrapper around fetch_trials_by_condition_async (use that one inside Jupyter / a running event loop).
         
         :param condition: Disease area (e.g., 'cancer', 'alzheimer', 'diabetes')
         :param phase: Trial phase filter ('PHASE1', 'PHASE2', 'PHASE3', 'PHASE4')
-        :param max_results: Number of trials to fetch (API limit: 1000 per request)
+        :param max_results: Number of trials to fetch (API limit: 1000 per page; larger pulls are paginated)
+        """
+        return asyncio.run(self.fetch_trials_by_condition_async(condition, phase, max_results))
+    
+    async def fetch_trials_by_condition_async(self, condition="cancer", phase="PHASE3", max_results=100):
+        """
+        Async version of fetch_trials_by_condition. Walks the API's nextPageToken chain over one
+        keep-alive httpx connection; await several of these with asyncio.gather to pull
+        multiple conditions concurrently. Each call returns only its own trials;
+        self.trials_data keeps every trial fetched by this pipeline.
         """
         print(f"Fetching {phase} {condition} trials from ClinicalTrials.gov...")
         
@@ -36,54 +112,37 @@ class BiotechTrialPipeline:
         }
         
         try:
-            response = requests.get(self.base_url, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            studies = []
+            async with httpx.AsyncClient(headers={"Accept-Encoding": "gzip"}, timeout=30) as client:
+                # Each page's token comes from the previous response, so pages are fetched in order
+                while len(studies) < max_results:
+                    response = await client.get(self.base_url, params=params)
+                    response.raise_for_status()
+                    data = orjson.loads(response.content)
+                    
+                    studies.extend(data.get('studies', []))
+                    
+                    next_token = data.get('nextPageToken')
+                    if not next_token:
+                        break
+                    params["pageToken"] = next_token
+                    params["pageSize"] = min(max_results - len(studies), 1000)
             
-            studies = data.get('studies', [])
+            studies = studies[:max_results]
             print(f"Retrieved {len(studies)} trials.")
             
-            # Extract relevant fields
-            for study in studies:
-                protocol = study.get('protocolSection', {})
-                
-                # Identification
-                nct_id = protocol.get('identificationModule', {}).get('nctId', 'N/A')
-                title = protocol.get('identificationModule', {}).get('officialTitle', 'N/A')
-                
-                # Sponsor (this is what we'll map to ticker)
-                sponsor_module = protocol.get('sponsorCollaboratorsModule', {})
-                lead_sponsor = sponsor_module.get('leadSponsor', {}).get('name', 'N/A')
+            # Extract relevant fields, then build the frame in one go (Arrow-backed string columns)
+            records = [_parse_study(study) for study in studies]
+            self.trials_data.extend(records)
                 
-                # Dates - THIS IS YOUR EVENT DATE
-                status_module = protocol.get('statusModule', {})
-                completion_date = status_module.get('primaryCompletionDateStruct', {}).get('date', None)
-                
-                # If no primary completion, try study completion
-                if not completion_date:
-                    completion_date = status_module.get('completionDateStruct', {}).get('date', None)
-                
-                # Phase verification
-                design_module = protocol.get('designModule', {})
-                phases = design_module.get('phases', [])
-                
-                # Store
-                self.trials_data.append({
-                    'nct_id': nct_id,
-                    'title': title,
-                    'sponsor': lead_sponsor,
-                    'completion_date': completion_date,
-                    'phase': ', '.join(phases) if phases else 'N/A',
-                    'status': status_module.get('overallStatus', 'N/A')
-                })
-                
-            return pd.DataFrame(self.trials_data)
+            trials_df = pd.DataFrame.from_records(records, columns=_TRIAL_COLUMNS)
+            return trials_df.convert_dtypes(dtype_backend='pyarrow')
             
-        except requests.exceptions.RequestException as e:
+        except (httpx.HTTPError, ValueError) as e:  # ValueError: body wasn't valid JSON
             print(f"API Error: {e}")
             return pd.DataFrame()
     
-    def map_sponsors_to_tickers(self, trials_df, mapping_file='sponsor_ticker_map.csv'):
+    def map_sponsors_to_tickers(self, trials_df, mapping_file='sponsor_ticker_map.csv', fuzzy_threshold=90):
         """
         CRITICAL FUNCTION: Maps sponsor company names to stock tickers.
         
@@ -103,25 +162,40 @@ class BiotechTrialPipeline:
         Eli Lilly and Company,LLY
         Pfizer,PFE
         Intra-Cellular Therapies Inc,ITCI
+        
+        Names are normalized on both sides (case, punctuation, 'Inc'/'LLC'/... suffixes) before
+        matching. Sponsors still unmatched are fuzzy-matched with rapidfuzz (if installed) and
+        accepted when the similarity score is above fuzzy_threshold (0-100; None disables).
         """
         try:
             # Load your manual mapping file
-            mapping_df = pd.read_csv(mapping_file)
+            mapping_df = pd.read_csv(mapping_file, engine='pyarrow', dtype_backend='pyarrow')
             print(f"Loaded {len(mapping_df)} sponsor-to-ticker mappings.")
             
-            # Merge with trials data
-            merged = trials_df.merge(
-                mapping_df, 
-                left_on='sponsor', 
-                right_on='sponsor', 
-                how='left'
-            )
+            # Look up tickers by normalized sponsor name (dict-backed map, no merge/alignment)
+            mapping_df['sponsor_norm'] = _normalize(mapping_df['sponsor'])
+            mapping_df = mapping_df.drop_duplicates('sponsor_norm')
+            mapping = dict(zip(mapping_df['sponsor_norm'], mapping_df['ticker']))
+            
+            sponsor_norm = _normalize(trials_df['sponsor'])
+            merged = trials_df.assign(ticker=sponsor_norm.map(mapping))
+            
+            # Fuzzy-match whatever the exact lookup missed (typos, stray words, ...)
+            missing = merged['ticker'].isna()
+            if HAS_RAPIDFUZZ and fuzzy_threshold is not None and missing.any():
+                unmatched = sponsor_norm[missing].dropna().unique()
+                scores = process.cdist(unmatched, mapping_df['sponsor_norm'].tolist(), scorer=fuzz.ratio, workers=-1)
+                best = scores.argmax(axis=1)
+                accepted = scores.max(axis=1) > fuzzy_threshold
+                fuzzy_map = dict(zip(unmatched[accepted], mapping_df['ticker'].to_numpy()[best[accepted]]))
+                merged['ticker'] = merged['ticker'].fillna(sponsor_norm.map(fuzzy_map))
+                print(f"Fuzzy-matched {len(fuzzy_map)} additional sponsor names.")
             
             # Filter out trials without ticker matches (private companies, non-US, etc.)
-            matched = merged[merged['ticker'].notna()].copy()
+            matched = merged.dropna(subset=['ticker']).copy()
             
             print(f"Matched {len(matched)} out of {len(trials_df)} trials to tickers.")
-            print(f"Unmatched sponsors: {merged[merged['ticker'].isna()]['sponsor'].unique()[:10]}")
+            print(f"Unmatched sponsors: {merged.loc[merged['ticker'].isna(), 'sponsor'].unique()[:10]}")
             
             return matched
             
@@ -138,13 +212,12 @@ class BiotechTrialPipeline:
         """
         trials_df['completion_date'] = pd.to_datetime(trials_df['completion_date'], errors='coerce')
         
-        today = pd.Timestamp.now()
-        future_cutoff = today + pd.Timedelta(days=days_ahead)
+        # Compare on the raw datetime64 ndarray (NaT compares False) instead of two aligned boolean Series
+        dates = trials_df['completion_date'].to_numpy(dtype='datetime64[ns]')
+        today = pd.Timestamp.now().to_datetime64()
+        future_cutoff = today + pd.Timedelta(days=days_ahead).to_timedelta64()
         
-        upcoming = trials_df[
-            (trials_df['completion_date'] >= today) & 
-            (trials_df['completion_date'] <= future_cutoff)
-        ].copy()
+        upcoming = trials_df.iloc[(dates >= today) & (dates <= future_cutoff)]
         
         print(f"Found {len(upcoming)} trials completing in next {days_ahead} days.")
         return upcoming.sort_values('completion_date')